@@ -1,14 +1,24 @@
 import os
+import asyncio
+import functools
+import html
 import random
 import re
+import secrets
+import time
 import logging
+import weakref
+from collections import Counter, deque
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, error
-from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes, CallbackQueryHandler
+from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes, CallbackQueryHandler, ChatMemberHandler
 from telegram.constants import ChatType
-from typing import Dict, List, Tuple
-from pymongo import MongoClient
+from typing import Dict, FrozenSet, List, Set, Tuple
+from pymongo import AsyncMongoClient, UpdateOne, WriteConcern
+from pymongo.asynchronous.cursor import AsyncCursor
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 
 # --- Logging Configuration ---
 logging.basicConfig(
@@ -21,20 +31,66 @@ load_dotenv()
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 MONGO_URL = os.getenv("MONGO_URL")
 MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "WordRushDB")
+# When enabled, guesses must be words from the bot's own word list
+STRICT_WORD_CHECK = os.getenv("STRICT_WORD_CHECK", "").lower() in ("1", "true", "yes")
+# Public HTTPS base URL; when set, Telegram pushes updates to a webhook instead of being long-polled
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "").rstrip('/')
+# Telegram echoes this in a header on every webhook call; requests without it are rejected as forged.
+# Without a configured value a random one is used, which is fine because setWebhook re-registers it on every start.
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET") or secrets.token_urlsafe(32)
+PORT = int(os.getenv("PORT", "8443"))
 try:
     ADMIN_USER_ID = int(os.getenv("ADMIN_USER_ID")) 
 except (TypeError, ValueError):
     ADMIN_USER_ID = 0 
     logger.warning("⚠️ ADMIN_USER_ID not set or invalid. Admin features will be disabled.")
 
+# --- Broadcast Throttling (Telegram allows ~30 msg/s per bot) ---
+BROADCAST_CONCURRENCY = 25  # Max in-flight sends; each slot is held for >= 1s, capping at ~25 msg/s
+
+# --- Leaderboard Cache ---
+LEADERBOARD_CACHE_TTL = 30  # Seconds a fetched leaderboard is served from memory (wins invalidate it sooner)
+
+LEADERBOARD_PERIODS = ('daily', 'weekly', 'monthly', 'global')
+
+# --- Telegram HTTP Client ---
+BOT_API_POOL_SIZE = 256  # Connections available to concurrent Bot API calls
+
+# --- Chat Activity Write-Behind ---
+CHAT_WRITE_BATCH_SIZE = 50  # Flush early once this many distinct chats are waiting
+CHAT_WRITE_INTERVAL = 5.0  # Otherwise flush pending chat updates this often (seconds)
+
+# --- Game State ---
+GUESS_HISTORY_LIMIT = 15  # Only the most recent guesses are kept on the stored board
+GAME_TTL_SECONDS = 86400  # Abandoned games are purged by a MongoDB TTL index after a day without guesses
+GAME_CACHE_SWEEP_INTERVAL = 3600  # How often expired games are evicted from the in-process cache
+
+# --- Admin Check Cache ---
+ADMIN_CACHE_TTL = 60  # Seconds a get_chat_member result is trusted
+ADMIN_CACHE_SWEEP_INTERVAL = 600  # How often expired admin checks are evicted
+
 # --- Configuration (Capped at 8 letters and using only 8-letter for hard/extreme) ---
-DIFFICULTY_CONFIG = {
-    'easy': {'length': 4, 'max_guesses': 30, 'base_points': 5, 'example': 'GAME'},
-    'medium': {'length': 5, 'max_guesses': 30, 'base_points': 10, 'example': 'APPLE'},
-    'hard': {'length': 8, 'max_guesses': 30, 'base_points': 20, 'example': 'FOOTBALL'},
-    'extreme': {'length': 8, 'max_guesses': 30, 'base_points': 50, 'example': 'FOOTBALL'} 
+@dataclass(frozen=True, slots=True)
+class Difficulty:
+    """Static settings for one difficulty level."""
+    length: int
+    max_guesses: int
+    base_points: int
+    example: str
+
+DIFFICULTY_CONFIG: Dict[str, Difficulty] = {
+    'easy': Difficulty(length=4, max_guesses=30, base_points=5, example='GAME'),
+    'medium': Difficulty(length=5, max_guesses=30, base_points=10, example='APPLE'),
+    'hard': Difficulty(length=8, max_guesses=30, base_points=20, example='FOOTBALL'),
+    'extreme': Difficulty(length=8, max_guesses=30, base_points=50, example='FOOTBALL') 
 }
 
+_VALID_DIFFICULTIES = frozenset(DIFFICULTY_CONFIG)
+_DIFFICULTY_LIST_STR = '/'.join(DIFFICULTY_CONFIG)
+
+# Flat per-difficulty lookups for the guess hot path
+LENGTH_BY_DIFFICULTY: Dict[str, int] = {level: c.length for level, c in DIFFICULTY_CONFIG.items()}
+
 # --- Word List (Using only up to 8-letter words) ---
 RAW_WORDS = [
     # 4-Letter Words
@@ -50,137 +106,344 @@ RAW_WORDS = [
     "SECURITY", "PASSWORD", "TELEGRAM", "BUSINESS", "FINANCES", "MARKETIN", "ADVERTSZ", "STRATEGY", "MANUFACT", "PRODUCTS", 
 ]
 
-WORDS_BY_LENGTH: Dict[int, List[str]] = {}
+_NON_ALPHA_RE = re.compile(r'[^A-Z]')  # Strips everything but uppercase ASCII letters, in C
+_VALID_LENGTHS = frozenset(c.length for c in DIFFICULTY_CONFIG.values())
+# Routes only messages that could be a guess in some game (4, 5 or 8 letters), so other
+# lengths never reach handle_guess or MongoDB; ASCII keeps [A-Za-z] free of Unicode lookups
+GUESS_RE = re.compile('^(?:' + '|'.join(f'[A-Za-z]{{{n}}}' for n in sorted(_VALID_LENGTHS)) + ')$', re.ASCII)
+
+_words_by_length: Dict[int, List[str]] = {}
 for word in RAW_WORDS:
-    cleaned_word = "".join(filter(str.isalpha, word.upper())) 
+    upper = word.upper()
+    # RAW_WORDS are plain ASCII letters, so the regex only runs for an odd entry
+    cleaned_word = upper if upper.isascii() and upper.isalpha() else _NON_ALPHA_RE.sub('', upper)
     length = len(cleaned_word)
-    if length <= 8 and length in [c['length'] for c in DIFFICULTY_CONFIG.values()]: 
-         WORDS_BY_LENGTH.setdefault(length, []).append(cleaned_word)
+    if length in _VALID_LENGTHS: # Also enforces the 8-letter cap: no difficulty is longer
+         _words_by_length.setdefault(length, []).append(cleaned_word)
+
+# Frozen into tuples: the word tables never change after import
+WORDS_BY_LENGTH: Dict[int, Tuple[str, ...]] = {length: tuple(words) for length, words in _words_by_length.items()}
+# Hash-based lookup for guess validation; the tuples above stay for random.choice
+WORDS_SET_BY_LENGTH: Dict[int, FrozenSet[str]] = {length: frozenset(words) for length, words in WORDS_BY_LENGTH.items()}
+# Resolved once so starting a game is a single lookup; levels of equal length share a tuple
+WORDS_BY_DIFFICULTY: Dict[str, Tuple[str, ...]] = {level: WORDS_BY_LENGTH.get(c.length, ()) for level, c in DIFFICULTY_CONFIG.items()}
+
+# Per-length shuffled queues: every word is dealt once before any repeats
+_WORD_RINGS: Dict[int, deque] = {length: deque(random.sample(words, len(words))) for length, words in WORDS_BY_LENGTH.items()}
+
+def pick_secret_word(length: int) -> str:
+    """Deals the next word of the given length, reshuffling once all have been used."""
+    ring = _WORD_RINGS[length]
+    if not ring:
+        words = WORDS_BY_LENGTH[length]
+        ring.extend(random.sample(words, len(words)))
+    return ring.popleft()
+
+def return_secret_word(length: int, word: str):
+    """Puts back a dealt word whose game never started, so it stays in the current cycle."""
+    _WORD_RINGS[length].appendleft(word)
          
-# --- MongoDB Manager Class (Unchanged from your last version) ---
+# --- MongoDB Manager Class ---
 class MongoDBManager:
     """Handles all interactions with MongoDB, now with time-based leaderboards."""
     def __init__(self, mongo_url: str, db_name: str):
         if not mongo_url:
             raise ValueError("MONGO_URL not provided.")
         
-        self.client = MongoClient(mongo_url, serverSelectionTimeoutMS=10000) 
+        # Native asyncio driver: DB round-trips yield to the event loop instead of blocking it.
+        # Connections are opened lazily; init() performs the first round-trip at startup.
+        self.client = AsyncMongoClient(
+            mongo_url,
+            connect=False,
+            serverSelectionTimeoutMS=10000,
+            maxPoolSize=20,          # Non-blocking I/O needs few sockets; caps them under bursts
+            minPoolSize=3,           # Keep warm connections so guesses never pay a cold connect
+            maxIdleTimeMS=60000,     # Recycle idle sockets before firewalls silently drop them
+            maxConnecting=4,         # Open connections faster than the default 2 during a burst
+            connectTimeoutMS=5000,
+            socketTimeoutMS=10000,   # Fail a hung operation instead of stalling a chat forever
+            compressors='zlib',      # Stdlib-backed wire compression, no extra packages needed
+            retryWrites=True,
+            appname='wordrush',      # Shows up in server logs and the Atlas profiler
+            tz_aware=True,           # Read dates back as aware UTC, comparable with datetime.now(timezone.utc)
+        )
         self.db = self.client[db_name]
         self.leaderboard_collection = self.db['leaderboard']
-        self.games_collection = self.db['active_games']
+        # Game state is transient (a lost guess just gets re-sent), so don't wait on the journal
+        self.games_collection = self.db.get_collection('active_games', write_concern=WriteConcern(w=1, j=False))
         self.chats_collection = self.db['known_chats'] 
-        
-        self.leaderboard_collection.create_index("user_id", unique=True)
-        self.games_collection.create_index("chat_id", unique=True)
-        self.chats_collection.create_index("chat_id", unique=True)
+        # (period, limit) -> (expires_at, rows); absorbs bursts of /leaderboard requests
+        self._lb_cache: Dict[Tuple[str, int], Tuple[float, List[Tuple[str, int, int]]]] = {}
+        # (period, limit) -> query in flight; concurrent misses share it instead of each hitting MongoDB
+        self._lb_pending: Dict[Tuple[str, int], asyncio.Task] = {}
+        self._lb_generation = 0 # Bumped by every win so queries started before it don't get cached
+        # chat_id -> live game state. This process is the only writer, so after the first read
+        # every guess is served from memory; MongoDB stays the durable copy for restarts.
+        self._game_cache: Dict[int, Dict] = {}
+        self._next_game_sweep = time.monotonic() + GAME_CACHE_SWEEP_INTERVAL
+        # Chats with a game in MongoDB (seeded by init()); most group messages come from chats
+        # without one, and this answers them without a round-trip
+        self.active_chats: Set[int] = set()
+        # Chat activity is recorded off the request path by run_chat_writer()
+        # chat_id -> (chat_type, last_active); repeat touches of a chat overwrite each other
+        self._pending_chats: Dict[int, Tuple[str, float]] = {}
+        self._chat_flush_needed = asyncio.Event()
+        self._chat_writer_stopping = False
+        self._chat_writer_task: asyncio.Task | None = None
+
+    async def init(self):
+        """Creates indexes; run once at startup from the event loop."""
+        await self.leaderboard_collection.create_index("user_id", unique=True)
+        # Lets the top-N query walk each period's ranking in order instead of sorting the collection.
+        # Carrying username and wins makes it a covered query, answered from the index alone.
+        for period in LEADERBOARD_PERIODS:
+            await self.leaderboard_collection.create_index([(f'points_{period}', -1), ('username', 1), (f'wins_{period}', 1)])
+        await self.games_collection.create_index("chat_id", unique=True)
+        # MongoDB's TTL monitor deletes games nobody is playing any more, keeping the collection small.
+        # Games saved before last_active existed start their TTL clock now rather than never expiring
+        await self.games_collection.update_many({'last_active': {'$exists': False}}, [{'$set': {'last_active': '$$NOW'}}])
+        await self.games_collection.create_index("last_active", expireAfterSeconds=GAME_TTL_SECONDS)
+        self.active_chats = set(await self.games_collection.distinct('chat_id'))
+        await self.chats_collection.create_index("chat_id", unique=True)
         logger.info("✅ MongoDB connection and indexing successful.")
 
-    def _get_reset_check_query(self, user_id: int, period: str) -> dict:
-        """Determines if the points/wins for a period need a reset."""
-        now = datetime.now(timezone.utc)
-        
+    def _get_reset_threshold(self, period: str, now: datetime) -> datetime:
+        """Wins older than this threshold no longer count towards the period's stats."""
         if period == 'daily':
-            reset_after = now - timedelta(days=1)
+            return now - timedelta(days=1)
         elif period == 'weekly':
-            reset_after = now - timedelta(weeks=1)
-        elif period == 'monthly':
-            reset_after = now - timedelta(days=30)
-        else: # Global
-            return {'$set': {}}
-
-        # $lt checks if the last win was BEFORE the reset threshold
-        return {
-            '$inc': {f'points_{period}': 0, f'wins_{period}': 0}, # Dummy $inc to allow $set
-            '$set': {
-                f'points_{period}': 0, 
-                f'wins_{period}': 0,
-            }
-        }, {f'last_win_date_{period}': {'$lt': reset_after}}
-
-
-    def update_leaderboard(self, user_id: int, username: str, points_to_add: int):
+            return now - timedelta(weeks=1)
+        return now - timedelta(days=30) # Monthly
+
+
+    async def update_leaderboard(self, user_id: int, username: str, points_to_add: int):
         now = datetime.now(timezone.utc)
-        update_global = {
-            '$inc': {'points_global': points_to_add, 'wins_global': 1},
-            '$set': {'username': username}
-        }
         
         # 1. Update Global stats
-        self.leaderboard_collection.update_one(
+        ops = [UpdateOne(
             {'user_id': user_id},
-            update_global,
+            {
+                '$inc': {'points_global': points_to_add, 'wins_global': 1},
+                '$set': {'username': username}
+            },
             upsert=True
-        )
+        )]
         
         # 2. Update Time-based stats
         periods = ['daily', 'weekly', 'monthly']
         for period in periods:
-            update_op, reset_query = self._get_reset_check_query(user_id, period)
-            
-            # 2a. Check if reset is needed and perform reset if true
-            # We use $inc: 0 and $set to conditionally set the points/wins to 0 
-            # if the last win date is too old.
-            
-            reset_result = self.leaderboard_collection.update_one(
-                {'user_id': user_id, f'last_win_date_{period}': {'$lt': now - timedelta(days=1) if period == 'daily' else now - timedelta(weeks=1) if period == 'weekly' else now - timedelta(days=30)}},
+            # 2a. Reset the period's points/wins if the last win date is too old ($lt the threshold)
+            ops.append(UpdateOne(
+                {'user_id': user_id, f'last_win_date_{period}': {'$lt': self._get_reset_threshold(period, now)}},
                 {'$set': {f'points_{period}': 0, f'wins_{period}': 0}}
-            )
+            ))
 
             # 2b. Now, increment the period-specific points/wins and update the win date
-            self.leaderboard_collection.update_one(
+            ops.append(UpdateOne(
                 {'user_id': user_id},
                 {
                     '$inc': {f'points_{period}': points_to_add, f'wins_{period}': 1},
                     '$set': {f'last_win_date_{period}': now}
                 },
                 upsert=True
-            )
+            ))
+
+        # Each reset must land before its increment, so this batch stays ordered.
+        # It is still a single round-trip instead of seven.
+        await self.leaderboard_collection.bulk_write(ops)
 
+        # Scores changed, so cached rankings (and queries already running) are stale
+        self._lb_generation += 1
+        self._lb_cache.clear()
+        self._lb_pending.clear()
 
-    def get_leaderboard_data(self, period: str, limit=10) -> List[Tuple[str, int, int]]:
+
+    async def get_leaderboard_data(self, period: str, limit=10) -> List[Tuple[str, int, int]]:
         """Retrieves leaderboard data for a specific period (daily, weekly, monthly, global)."""
+        cache_key = (period, limit)
+        cached = self._lb_cache.get(cache_key)
+        if cached and time.monotonic() < cached[0]:
+            return cached[1]
+
+        task = self._lb_pending.get(cache_key)
+        if task is None:
+            task = asyncio.create_task(self._fetch_leaderboard(period, limit))
+            self._lb_pending[cache_key] = task
+
+            def _forget(t: asyncio.Task):
+                # A win may already have replaced this entry with a newer query; leave that one alone
+                if self._lb_pending.get(cache_key) is t:
+                    del self._lb_pending[cache_key]
+
+            task.add_done_callback(_forget)
+        # shield: one caller being cancelled must not cancel the query the others are waiting on
+        return await asyncio.shield(task)
+
+    async def _fetch_leaderboard(self, period: str, limit: int) -> List[Tuple[str, int, int]]:
+        generation = self._lb_generation
         points_key = f'points_{period}'
         wins_key = f'wins_{period}'
         
-        # Query: Find all entries, sort by points for the given period
-        data = list(self.leaderboard_collection.find().sort(points_key, -1).limit(limit))
+        # Only show users who have actually played in this period (points > 0); filtering
+        # server-side keeps the ranking in index order, so no client-side re-sort is needed
+        query = {} if period == 'global' else {points_key: {'$gt': 0}}
+        projection = {'_id': 0, 'username': 1, points_key: 1, wins_key: 1}
+        cursor = self.leaderboard_collection.find(query, projection).sort(points_key, -1).limit(limit).batch_size(limit)
         
-        result = []
-        for doc in data:
-            points = doc.get(points_key, 0)
-            wins = doc.get(wins_key, 0)
-            
-            # Ensure we only show users who have actually played in this period (points > 0)
-            if points > 0 or period == 'global':
-                 result.append((doc.get('username'), points, wins))
-                 
-        # Re-sort to ensure integrity
-        result.sort(key=lambda x: x[1], reverse=True)
-        return result[:limit]
-
-    def get_game_state(self, chat_id: int) -> Dict | None:
-        return self.games_collection.find_one({'chat_id': chat_id})
-
-    def save_game_state(self, chat_id: int, state: Dict):
+        result = [(doc.get('username'), doc.get(points_key, 0), doc.get(wins_key, 0)) async for doc in cursor]
+        if generation == self._lb_generation:
+            self._lb_cache[(period, limit)] = (time.monotonic() + LEADERBOARD_CACHE_TTL, result)
+        return result
+
+    async def get_game_state(self, chat_id: int) -> Dict | None:
+        """Returns the live cached state; callers mutate it in place and then persist via record_guess."""
+        if chat_id not in self.active_chats:
+            return None
+        game = self._game_cache.get(chat_id)
+        if game is not None and self._is_expired(game):
+            # MongoDB drops it via the TTL index; the cache has to forget it too
+            del self._game_cache[chat_id]
+            game = None
+        if game is None:
+            game = await self.games_collection.find_one({'chat_id': chat_id})
+            if game and self._is_expired(game):
+                game = None # Past its TTL; the server-side monitor just hasn't swept it yet
+            if game:
+                self._game_cache[chat_id] = game
+            else:
+                self.active_chats.discard(chat_id) # Swept by the TTL monitor (or expiring now)
+        return game
+
+    def _is_expired(self, game: Dict) -> bool:
+        last_active = game.get('last_active')
+        return last_active is not None and datetime.now(timezone.utc) - last_active > timedelta(seconds=GAME_TTL_SECONDS)
+
+    async def create_game(self, chat_id: int, state: Dict) -> bool:
+        """Stores a new game unless one is already running; the unique chat_id index makes check-and-write one round-trip."""
+        if chat_id in self._game_cache and not self._is_expired(self._game_cache[chat_id]):
+            return False
         state_to_save = {'chat_id': chat_id, **state}
-        self.games_collection.replace_one(
-            {'chat_id': chat_id}, 
-            state_to_save, 
-            upsert=True
-        )
+        try:
+            await self.games_collection.insert_one(state_to_save)
+        except DuplicateKeyError:
+            # Only a game past its TTL that the monitor hasn't swept yet may be replaced
+            expired_before = datetime.now(timezone.utc) - timedelta(seconds=GAME_TTL_SECONDS)
+            result = await self.games_collection.replace_one(
+                {'chat_id': chat_id, 'last_active': {'$lt': expired_before}},
+                state_to_save
+            )
+            if not result.matched_count:
+                self.active_chats.add(chat_id) # A live game we didn't know about; track it from now on
+                return False
+        state_to_save.pop('_id', None) # insert_one adds it; the cache should mirror what a fresh read returns
+        self._game_cache[chat_id] = state_to_save
+        self.active_chats.add(chat_id)
+        self._sweep_game_cache()
+        return True
+
+    def _sweep_game_cache(self):
+        """Drops cached games past their TTL so chats that never come back don't pin memory."""
+        now = time.monotonic()
+        if now < self._next_game_sweep:
+            return
+        self._next_game_sweep = now + GAME_CACHE_SWEEP_INTERVAL
+        for chat_id in [cid for cid, game in self._game_cache.items() if self._is_expired(game)]:
+            del self._game_cache[chat_id]
 
-    def delete_game_state(self, chat_id: int):
-        self.games_collection.delete_one({'chat_id': chat_id})
+    async def delete_game_state(self, chat_id: int):
+        self._game_cache.pop(chat_id, None)
+        self.active_chats.discard(chat_id)
+        await self.games_collection.delete_one({'chat_id': chat_id})
+
+    async def record_guess(self, chat_id: int, feedback: str, word: str):
+        """Appends one guess server-side; $slice keeps the stored history capped."""
+        now = datetime.now(timezone.utc)
+        try:
+            result = await self.games_collection.update_one(
+                # Also enforces guess uniqueness server-side, so a replayed write can't count twice
+                {'chat_id': chat_id, 'guessed_words': {'$ne': word}},
+                {
+                    '$inc': {'guesses_made': 1},
+                    '$set': {'last_active': now}, # Pushes back the TTL expiry while the game is being played
+                    '$push': {
+                        'guess_history': {'$each': [{'f': feedback, 'w': word}], '$slice': -GUESS_HISTORY_LIMIT},
+                        'guessed_words': word,
+                    }
+                },
+                upsert=False # Never resurrect a game that /end removed in the meantime
+            )
+            if not result.matched_count:
+                # The stored game moved on without us (ended or already has this guess); resync on next read
+                self._game_cache.pop(chat_id, None)
+            elif chat_id in self._game_cache:
+                self._game_cache[chat_id]['last_active'] = now
+        except Exception:
+            # The cached copy already has this guess; drop it so the next read resyncs from MongoDB
+            self._game_cache.pop(chat_id, None)
+            raise
+
+    async def set_board_message(self, chat_id: int, message_id: int):
+        """Remembers which message is the chat's live game board."""
+        await self.games_collection.update_one({'chat_id': chat_id}, {'$set': {'board_message_id': message_id}})
+        if chat_id in self._game_cache:
+            self._game_cache[chat_id]['board_message_id'] = message_id
 
     def add_chat(self, chat_id: int, chat_type: str, date: float):
-        self.chats_collection.update_one(
-            {'chat_id': chat_id},
-            {'$set': {'chat_type': chat_type, 'last_active': date}},
-            upsert=True
-        )
+        """Buffers a chat activity update; the actual write happens in the background."""
+        self._pending_chats[chat_id] = (chat_type, date)
+        if len(self._pending_chats) >= CHAT_WRITE_BATCH_SIZE:
+            self._chat_flush_needed.set()
 
-    def get_all_chat_ids(self) -> List[int]:
-        return [doc['chat_id'] for doc in self.chats_collection.find({}, {'chat_id': 1})]
+    async def _write_chats(self, batch: Dict[int, Tuple[str, float]]):
+        if not batch:
+            return
+        ops = [
+            UpdateOne({'chat_id': chat_id}, {'$set': {'chat_type': chat_type, 'last_active': date}}, upsert=True)
+            for chat_id, (chat_type, date) in batch.items()
+        ]
+        try:
+            # Per-chat upserts are independent, so let the server apply them in any order
+            await self.chats_collection.bulk_write(ops, ordered=False)
+        except BulkWriteError as e:
+            logger.error(f"Failed to write {len(e.details.get('writeErrors', []))} of {len(ops)} chat updates: {e.details.get('writeErrors')}")
+        except Exception as e:
+            logger.error(f"Failed to write {len(ops)} chat updates: {e}")
+
+    async def _flush_chats(self):
+        batch, self._pending_chats = self._pending_chats, {}
+        await self._write_chats(batch)
+
+    async def run_chat_writer(self):
+        """Flushes buffered chat updates every CHAT_WRITE_INTERVAL seconds, or sooner when the buffer fills."""
+        while not self._chat_writer_stopping:
+            try:
+                await asyncio.wait_for(self._chat_flush_needed.wait(), CHAT_WRITE_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._chat_flush_needed.clear()
+            await self._flush_chats()
+
+    def start_chat_writer(self):
+        self._chat_writer_stopping = False
+        self._chat_writer_task = asyncio.create_task(self.run_chat_writer())
+
+    async def stop_chat_writer(self):
+        """Stops the background writer and flushes anything still buffered."""
+        if self._chat_writer_task:
+            # Let the loop finish its current write and exit instead of cancelling it mid-flush
+            self._chat_writer_stopping = True
+            self._chat_flush_needed.set()
+            await self._chat_writer_task
+            self._chat_writer_task = None
+        await self._flush_chats()
+
+    async def count_chats(self) -> int:
+        return await self.chats_collection.estimated_document_count()
+
+    def iter_chat_ids(self, batch_size: int = 100) -> AsyncCursor:
+        """Streams known chat IDs in batches instead of loading them all into memory."""
+        # Hinting the chat_id index turns the collection scan into a covered index scan: no documents are read
+        return self.chats_collection.find({}, {'_id': 0, 'chat_id': 1}).hint([('chat_id', 1)]).batch_size(batch_size)
 
 # --- Initialize MongoDB Manager ---
 mongo_manager = None
@@ -194,314 +457,489 @@ except Exception as e:
     mongo_manager = None 
 
 # --- Core Game Logic Functions ---
-# (get_feedback and calculate_points remain unchanged)
 
-def get_feedback(secret_word: str, guess: str) -> str:
-    """Generates the Wordle-style color-coded feedback (🟩, 🟨, 🟥)."""
-    length = len(secret_word)
-    feedback = ['🟥'] * length 
-    remaining_letters = {}
+# Feedback is scored as one ASCII digit per letter (the compact form that gets stored)
+# and only turned into emoji blocks when displayed
+_RIGHT, _WRONG_PLACE, _ABSENT = b'210' # Indexing bytes yields the digits' int codes
+_FEEDBACK_RENDER = str.maketrans({'2': '🟩', '1': '🟨', '0': '🟥'})
+
+def get_feedback_codes(secret_word: str, guess: str) -> str:
+    """Scores a guess as one digit per letter: 2 = right place, 1 = wrong place, 0 = absent."""
+    # Guess length is validated upstream, so both words can be zipped directly
+    codes = bytearray(_RIGHT if s == g else _ABSENT for s, g in zip(secret_word, guess))
+    # Letters still available for yellows: everything not already claimed by a green
+    remaining = Counter(s for s, c in zip(secret_word, codes) if c == _ABSENT)
+
+    for i, g in enumerate(guess):
+        if codes[i] == _ABSENT and remaining[g]:
+            codes[i] = _WRONG_PLACE
+            remaining[g] -= 1
     
-    for letter in secret_word:
-        remaining_letters[letter] = remaining_letters.get(letter, 0) + 1
-
-    # First pass: Green (Correct position)
-    for i in range(length):
-        if i < len(guess) and guess[i] == secret_word[i]:
-            feedback[i] = '🟩'
-            remaining_letters[guess[i]] -= 1
+    return codes.decode('ascii')
+
+def _make_feedback_scorer(n: int):
+    """Builds get_feedback_codes unrolled for n-letter words: straight-line code, no loops or indexing."""
+    s = [f's{i}' for i in range(n)]
+    g = [f'g{i}' for i in range(n)]
+    c = [f'c{i}' for i in range(n)]
+    lines = [
+        "def score(secret_word, guess):",
+        f"    {', '.join(s)}, = secret_word",
+        f"    {', '.join(g)}, = guess",
+        "    remaining = {}",
+    ]
+    for i in range(n): # Greens first; every other secret letter is left for the yellows
+        lines.append(f"    if {s[i]} == {g[i]}: {c[i]} = '2'")
+        lines.append(f"    else: {c[i]} = '0'; remaining[{s[i]}] = remaining.get({s[i]}, 0) + 1")
+    for i in range(n):
+        lines.append(f"    if {c[i]} == '0' and remaining.get({g[i]}): {c[i]} = '1'; remaining[{g[i]}] -= 1")
+    lines.append(f"    return {' + '.join(c)}")
+    namespace: Dict = {}
+    exec('\n'.join(lines), namespace)
+    return namespace['score']
+
+# One unrolled scorer per playable word length, about 3x faster than the generic loop
+_FEEDBACK_SCORERS = {length: _make_feedback_scorer(length) for length in _VALID_LENGTHS}
+
+def render_feedback(codes: str) -> str:
+    """Turns feedback codes into 🟩/🟨/🟥 blocks; already-rendered blocks pass through unchanged."""
+    return codes.translate(_FEEDBACK_RENDER)
+
+def score_guess(secret_word: str, guess: str) -> str:
+    """Feedback codes via the unrolled scorer for this length, or the generic loop for any other."""
+    scorer = _FEEDBACK_SCORERS.get(len(secret_word))
+    return scorer(secret_word, guess) if scorer else get_feedback_codes(secret_word, guess)
+
+# Games saved before feedback codes stored each guess as a Markdown line: " `🟩🟥` - **WORD**"
+_LEGACY_HISTORY_RE = re.compile(r'`([^`]*)` - \*\*([A-Z]*)\*\*')
+
+def _history_entry(entry) -> Tuple[str, str]:
+    """(feedback, word) for a stored guess, whether a {'f', 'w'} dict or a legacy Markdown line."""
+    if isinstance(entry, dict):
+        return entry['f'], entry['w']
+    match = _LEGACY_HISTORY_RE.search(entry)
+    return match.groups() if match else ('', html.escape(entry)) # Already-rendered blocks pass through render_feedback()
+
+def format_guess_history(guess_history: List) -> str:
+    """Renders stored guesses in the board format: Blocks - WORD."""
+    # Only the feedback field is translated, so digits elsewhere (e.g. in escaped legacy text) survive
+    return "\n".join(f" <code>{render_feedback(f)}</code> - <b>{w}</b>" for f, w in map(_history_entry, guess_history))
+
+def _points_formula(difficulty: str, guesses: int) -> int:
+    # Higher bonus for fewer guesses
+    return DIFFICULTY_CONFIG[difficulty].base_points + max(0, 10 - (guesses - 1) * 2)
 
-    # Second pass: Yellow (Correct letter, wrong position)
-    for i in range(length):
-        if feedback[i] == '🟥' and i < len(guess):
-            letter = guess[i]
-            if letter in remaining_letters and remaining_letters[letter] > 0:
-                feedback[i] = '🟨'
-                remaining_letters[letter] -= 1
-    
-    return "".join(feedback)
+# Every (difficulty, guesses) score within the configured limits is known up front
+POINTS_TABLE: Dict[str, Tuple[int, ...]] = {
+    level: tuple(_points_formula(level, guesses) for guesses in range(1, c.max_guesses + 1))
+    for level, c in DIFFICULTY_CONFIG.items()
+}
 
 def calculate_points(difficulty: str, guesses: int) -> int:
     """Calculates points based on difficulty and efficiency."""
-    config = DIFFICULTY_CONFIG[difficulty]
-    base = config['base_points']
-    # Higher bonus for fewer guesses
-    bonus = max(0, 10 - (guesses - 1) * 2) 
-    return base + bonus
+    points = POINTS_TABLE[difficulty]
+    # A game stores its own max_guesses, which may exceed the current config's if the limit was lowered
+    return points[guesses - 1] if guesses <= len(points) else _points_formula(difficulty, guesses)
 
 async def start_new_game_logic(chat_id: int, difficulty: str) -> Tuple[bool, str]:
-    if not mongo_manager: return False, "❌ *Database Error*. Game cannot be started without database access."
+    if not mongo_manager: return False, "❌ <i>Database Error</i>. Game cannot be started without database access."
     
     difficulty = difficulty.lower()
-    if difficulty not in DIFFICULTY_CONFIG:
+    if difficulty not in _VALID_DIFFICULTIES:
         difficulty = 'medium'
         
     config = DIFFICULTY_CONFIG[difficulty]
-    length = config['length']
-    word_list = WORDS_BY_LENGTH.get(length)
+    length = config.length
     
-    if not word_list:
-        return False, f"❌ *Error*: No secret words found for **{difficulty}** ({length} letters). Contact admin."
+    if not WORDS_BY_DIFFICULTY[difficulty]:
+        return False, f"❌ <i>Error</i>: No secret words found for <b>{difficulty}</b> ({length} letters). Contact admin."
+
+    # Don't deal a word for a start that is going to be refused; free for chats with no game (see active_chats)
+    if await mongo_manager.get_game_state(chat_id):
+        return False, GAME_ACTIVE_TEXT
     
-    # Select a secret word from the list
-    secret_word = random.choice(word_list)
+    # Select a secret word from the list (no repeats until the list is exhausted)
+    secret_word = pick_secret_word(length)
     
     initial_state = {
         'word': secret_word,
         'difficulty': difficulty,
         'guesses_made': 0,
-        'max_guesses': config['max_guesses'],
+        'max_guesses': config.max_guesses,
         'guess_history': [],
-        'guessed_words': [] # NEW: To track unique words guessed
+        'guessed_words': [], # NEW: To track unique words guessed
+        'last_active': datetime.now(timezone.utc), # Drives the TTL cleanup of abandoned games; refreshed by every guess
     }
-    mongo_manager.save_game_state(chat_id, initial_state)
+    if not await mongo_manager.create_game(chat_id, initial_state):
+        return_secret_word(length, secret_word)
+        return False, GAME_ACTIVE_TEXT
     
     return True, (
-        f"**✨ New Word Rush Challenge!**\n"
+        f"<b>✨ New Word Rush Challenge!</b>\n"
         f"-------------------------------------\n"
-        f"🎯 Difficulty: **{difficulty.capitalize()}**\n"
-        f"📜 Word Length: **{length} letters** (Example: `{config['example']}`)\n"
-        f"➡️ *Send your {length}-letter guess directly to the chat!*"
+        f"🎯 Difficulty: <b>{difficulty.capitalize()}</b>\n"
+        f"📜 Word Length: <b>{length} letters</b> (Example: <code>{config.example}</code>)\n"
+        f"➡️ <i>Send your {length}-letter guess directly to the chat!</i>"
     )
 
-async def process_guess_logic(chat_id: int, guess: str) -> Tuple[str, bool, str, int, List[str]]:
-    """Processes a user's guess and returns feedback, win status, and points."""
-    if not mongo_manager: return "", False, "Database Error.", 0, []
-
-    game = mongo_manager.get_game_state(chat_id)
-    if not game:
-        return "", False, "No active game.", 0, []
+async def process_guess_logic(chat_id: int, game: Dict, guess: str) -> Tuple[bool, str, int, List[Dict], str]:
+    """Processes a user's guess against the already-fetched game and returns win status, points, history and the secret word."""
+    if not mongo_manager: return False, "Database Error.", 0, [], ""
     
     secret_word = game['word']
-    # Guess is already cleaned/uppercase by the MessageHandler filters
-    guess_clean = guess.upper()
+    # The MessageHandler regex already limits guesses to letters; this is a cheap safety net
+    guess_upper = guess.upper()
+    guess_clean = _NON_ALPHA_RE.sub('', guess_upper)
 
-    config = DIFFICULTY_CONFIG[game['difficulty']]
-    length = config['length']
+    length = LENGTH_BY_DIFFICULTY[game['difficulty']]
     
     # 1. Validation for length (Should match game length)
     if len(guess_clean) != length:
         # User message for incorrect length
-        return "", False, f"❌ **`{guess.upper()}`** *must be exactly* **{length}** *letters long*.", 0, game.get('guess_history', [])
+        return False, f"❌ <b><code>{html.escape(guess_upper)}</code></b> <i>must be exactly</i> <b>{length}</b> <i>letters long</i>.", 0, game.get('guess_history', []), secret_word
     
+    # 1b. Optional dictionary check (see STRICT_WORD_CHECK)
+    if STRICT_WORD_CHECK and guess_clean not in WORDS_SET_BY_LENGTH.get(length, frozenset()):
+        return False, f"❌ <b><code>{html.escape(guess_upper)}</code></b> <i>is not in the word list</i>.", 0, game.get('guess_history', []), secret_word
+
     # 2. NEW: Check if word has already been guessed
     if guess_clean in game.get('guessed_words', []):
         # User message for duplicate guess
-        return "", False, f"❌ **`{guess.upper()}`** *already guessed! Try a new word*.", 0, game.get('guess_history', [])
+        return False, f"❌ <b><code>{html.escape(guess_upper)}</code></b> <i>already guessed! Try a new word</i>.", 0, game.get('guess_history', []), secret_word
 
     
     game['guesses_made'] += 1
-    game['guessed_words'].append(guess_clean) # Add the valid guess to the list
+    game['guessed_words'].append(guess_clean) # Keeps the cached state in step with record_guess
     
-    # 3. Generate Feedback and update history
-    feedback_str = get_feedback(secret_word, guess_clean)
-    # Storing in the required format: Blocks - WORD
-    game['guess_history'].append(f" `{feedback_str}` - **{guess_clean}**") 
+    # 3. Generate Feedback and update history (compact digit codes; emoji and HTML are applied when rendering)
+    feedback_codes = score_guess(secret_word, guess_clean)
+    game['guess_history'].append({'f': feedback_codes, 'w': guess_clean})
+    del game['guess_history'][:-GUESS_HISTORY_LIMIT]
     
     # 4. Check for Win
     if guess_clean == secret_word:
         guesses = game['guesses_made']
         points = calculate_points(game['difficulty'], guesses)
-        game_word_for_loss = game['word']
-        mongo_manager.delete_game_state(chat_id) 
-        return feedback_str, True, "WIN", points, game['guess_history']
+        # The caller deletes the game together with the leaderboard write (see handle_guess)
+        return True, "WIN", points, game['guess_history'], secret_word
 
     # 5. Check for Loss
     remaining = game['max_guesses'] - game['guesses_made']
     
     if remaining <= 0:
-        game_word_for_loss = game['word']
-        mongo_manager.delete_game_state(chat_id) 
-        # For loss, we return the secret word as status
-        return feedback_str, False, f"LOSS_WORD:{game_word_for_loss}", 0, game['guess_history']
+        await mongo_manager.delete_game_state(chat_id) 
+        return False, "LOSS", 0, game['guess_history'], secret_word
     
     # Status for ongoing game
-    mongo_manager.save_game_state(chat_id, game)
-    return feedback_str, False, f"Guesses left: **{remaining}**", 0, game['guess_history']
+    await mongo_manager.record_guess(chat_id, feedback_codes, guess_clean)
+    return False, f"Guesses left: <b>{remaining}</b>", 0, game['guess_history'], secret_word
 
-# --- Telegram UI & Handler Functions (All Unchanged) ---
+# --- Telegram UI & Handler Functions ---
+
+# (chat_id, user_id) -> (expires_at, is_admin)
+_admin_cache: Dict[Tuple[int, int], Tuple[float, bool]] = {}
+_admin_cache_next_sweep = 0.0
+
+def _sweep_admin_cache(now: float):
+    """Drops expired admin checks so users who never come back don't pin memory."""
+    global _admin_cache_next_sweep
+    if now < _admin_cache_next_sweep:
+        return
+    _admin_cache_next_sweep = now + ADMIN_CACHE_SWEEP_INTERVAL
+    for key in [key for key, (expires_at, _) in _admin_cache.items() if expires_at <= now]:
+        del _admin_cache[key]
 
 async def is_group_admin(update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
     # Any user is considered "admin" in a private chat for commands like /end and /difficulty
     if update.effective_chat.type == ChatType.PRIVATE:
         return True
+
+    cache_key = (update.effective_chat.id, update.effective_user.id)
+    cached = _admin_cache.get(cache_key)
+    if cached:
+        if time.monotonic() < cached[0]:
+            return cached[1]
+        del _admin_cache[cache_key]
+
     try:
         member = await context.bot.get_chat_member(update.effective_chat.id, update.effective_user.id)
-        return member.status in ['administrator', 'creator']
     except Exception:
         return False
+    is_admin = member.status in ['administrator', 'creator']
+    now = time.monotonic()
+    _admin_cache[cache_key] = (now + ADMIN_CACHE_TTL, is_admin)
+    _sweep_admin_cache(now)
+    return is_admin
+
+async def chat_member_update_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Drops the cached admin status of a member whose role just changed."""
+    member_update = update.chat_member
+    _admin_cache.pop((member_update.chat.id, member_update.new_chat_member.user.id), None)
+
+# --- Per-Chat Ordering ---
+# Updates are processed concurrently across chats, but handlers that read and write a chat's
+# game run one at a time per chat so guesses cannot interleave. Weak values let idle locks go.
+_chat_locks: "weakref.WeakValueDictionary[int, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+def serialize_per_chat(handler):
+    """Decorator: runs the handler under the chat's lock."""
+    @functools.wraps(handler)
+    async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        if not update.effective_chat:
+            return await handler(update, context)
+        chat_id = update.effective_chat.id
+        lock = _chat_locks.get(chat_id)
+        if lock is None:
+            lock = _chat_locks[chat_id] = asyncio.Lock()
+        async with lock:
+            return await handler(update, context)
+    return wrapper
+
+# --- Message Templates (Built once at import; per-game ones are filled with format_map) ---
+
+WELCOME_TEXT = (
+    "👋 <i>Hello! I'm</i> <b>@narzowordseekbot</b> 🤖\n"
+    "-------------------------------------\n"
+    "The <b>Ultimate Word Challenge</b> on Telegram!\n\n"
+    "📜 <b>Goal:</b> <i>Guess the secret word using hints (🟩/🟨/🟥).</i>\n"
+    "🏆 <b>Compete:</b> <i>Win to earn points and climb the Global Leaderboard!</i> 🌐\n\n"
+    "👉 Tap <b>/new</b> or the button below to start your rush!\n"
+    "-------------------------------------"
+)
 
-# --- Keyboard Functions (Unchanged) ---
+HELP_MENU_TEXT = (
+    "📖 <b>WordRush Help Center</b>\n"
+    "-------------------------------------\n"
+    "<i>Choose a topic below to get assistance.</i>\n"
+    "<i>For any issue, please ask in the Report group!</i>"
+)
 
-def get_start_keyboard():
-    keyboard = [
-        [InlineKeyboardButton("❓ Help & Info", callback_data="show_help_menu")],
-        [
-            InlineKeyboardButton("💬 Report Bugs", url="https://t.me/Onlymrabhi01"), 
-            InlineKeyboardButton("📢 Updates Channel", url="https://t.me/narzob") 
-        ],
-        [InlineKeyboardButton("➕ Add Bot to Group", url="https://t.me/narzowordseekbot?startgroup=true")]
-    ]
-    return InlineKeyboardMarkup(keyboard)
-
-def get_help_menu_keyboard():
-    keyboard = [
-        [InlineKeyboardButton("📝 How to Play", callback_data="show_how_to_play")],
-        [InlineKeyboardButton("📘 Commands List", callback_data="show_commands")],
-        [InlineKeyboardButton("🏆 Leaderboard", callback_data="show_leaderboard_menu")],
-        [InlineKeyboardButton("🏠 Back to Start", callback_data="back_to_start")]
-    ]
-    return InlineKeyboardMarkup(keyboard)
+_lengths = sorted(_VALID_LENGTHS)
+HOW_TO_PLAY_TEXT = (
+    "🤔 <b>How to Play Word Rush</b> ❓\n"
+    "-------------------------------------\n"
+    "1. <b>The Word:</b> <i>Guess a secret word</i>, length depends on difficulty ({lengths} letters).\n\n"
+    "2. <b>The Hints (<code>Boxes - Word</code>):</b>\n"
+    "   • 🟢 <i>Green</i> = Correct letter, <b>Right Place</b>.\n"
+    "   • 🟡 <i>Yellow</i> = Correct letter, <b>Wrong Place</b>.\n"
+    "   • 🔴 <i>Red</i> = Letter <b>Not in the Word</b>.\n\n"
+    "3. <b>The Game:</b> You have <i>{max_guesses} guesses</i>. The person who wins with the fewest guesses gets the most points! 🥇"
+).format(
+    lengths=", ".join(map(str, _lengths[:-1])) + f", or {_lengths[-1]}",
+    max_guesses=max(c.max_guesses for c in DIFFICULTY_CONFIG.values()),
+)
 
-def get_play_again_keyboard():
-    keyboard = [
-        [InlineKeyboardButton("🎯 Start New Game", callback_data="new_game_menu")] 
-    ]
-    return InlineKeyboardMarkup(keyboard)
-
-def get_new_game_keyboard():
-    keyboard = [
-        [
-            InlineKeyboardButton("⭐ Easy (4 letters)", callback_data="start_easy"),
-            InlineKeyboardButton("🌟 Medium (5 letters)", callback_data="start_medium")
-        ],
-        [
-            InlineKeyboardButton("🔥 Hard (8 letters)", callback_data="start_hard"),
-            InlineKeyboardButton("💎 Extreme (8 letters, High Pts)", callback_data="start_extreme")
-        ],
-        [InlineKeyboardButton("🏠 Back to Start", callback_data="back_to_start")]
-    ]
-    return InlineKeyboardMarkup(keyboard)
-
-def get_leaderboard_menu_keyboard(): 
-    keyboard = [
-        [
-            InlineKeyboardButton("☀️ Daily", callback_data="show_leaderboard_daily"),
-            InlineKeyboardButton("📅 Weekly", callback_data="show_leaderboard_weekly"),
-        ],
-        [
-            InlineKeyboardButton("🗓️ Monthly", callback_data="show_leaderboard_monthly"),
-            InlineKeyboardButton("🌎 Global", callback_data="show_leaderboard_global"),
-        ],
-        [InlineKeyboardButton("🔙 Back to Help", callback_data="show_help_menu")]
-    ]
-    return InlineKeyboardMarkup(keyboard)
+COMMANDS_TEXT = (
+    "📘 <b>Word Rush Commands List</b>\n"
+    "-------------------------------------\n"
+    "• <b>/new</b> [difficulty] → <i>Start a game</i>.\n"
+    "• <b>/status</b> → <i>Show current game status and history</i> (New Feature!).\n"
+    "• <b>/leaderboard</b> [period] → <i>Show global/daily/weekly/monthly rankings</i>.\n"
+    "• <b>/end</b> → <i>End current game</i> (Admin Only / DM).\n"
+    "• <b>/difficulty</b> → <i>Show difficulty settings</i> (Admin Only / DM).\n"
+)
+
+DIFFICULTY_SETTINGS_TEXT = (
+    "<b>⚙️ Word Rush Difficulty Settings</b>\n"
+    "-------------------------------------\n"
+    + "".join(
+        f"<b>{level.capitalize()}</b>:\n"
+        f"   - Word Length: <b>{config.length}</b> letters\n"
+        f"   - Max Guesses: <b>{config.max_guesses}</b>\n"
+        f"   - Base Points: <b>{config.base_points}</b>\n"
+        f"   - Example: <code>{config.example}</code>\n\n"
+        for level, config in DIFFICULTY_CONFIG.items()
+    )
+    + f"👉 <i>Use</i> <code>/new &lt;level&gt;</code> <i>to start a game with a specific difficulty.</i> ({_DIFFICULTY_LIST_STR}, e.g., <code>/new hard</code>)"
+)
+
+WIN_TEXT = (
+    "<b>🏆 GAME WON! 🥳</b>\n"
+    "-------------------------------------\n"
+    "<i>Congratulations</i> <b>{username}</b>!\n"
+    "You cracked the code in <b>{attempts}</b> attempts!\n"
+    "✨ Points earned: <b><code>{points}</code></b>\n\n"
+    "📜 <b>Final Board:</b>\n"
+    "{history}\n\n"
+    "✅ <i>The secret word was:</i> <b><code>{word}</code></b>"
+)
 
-# --- Leaderboard Utility Function (Unchanged) ---
+LOSS_TEXT = (
+    "💔 <b>GAME OVER! 😭</b>\n"
+    "-------------------------------------\n"
+    "<i>Maximum guesses reached</i> (<b>{max_guesses}</b>).\n\n"
+    "📜 <b>Final Board:</b>\n"
+    "{history}\n\n"
+    "❌ <i>The secret word was:</i> <b><code>{word}</code></b>"
+)
+
+ONGOING_TEXT = (
+    "<b>Word Rush Challenge</b> 🎯\n"
+    "-------------------------------------\n"
+    "Attempts: <b><code>{attempts}</code></b> / <b><code>{max_guesses}</code></b>\n\n"
+    "📜 <b>Guess History:</b>\n"
+    "{history}\n\n"
+    "👉 {status}" # Displays: Guesses left: <b>27</b>
+)
+
+# Short per-guess reply sent when the board itself was updated in place
+GUESS_ACK_TEXT = "{line}\n👉 {status}"
+
+GAME_ACTIVE_TEXT = "⏳ <i>A game is already active</i>. Use <b>/end</b> to stop it first."
+
+# --- Keyboards (Static, so built once at import) ---
+
+START_KEYBOARD = InlineKeyboardMarkup([
+    [InlineKeyboardButton("❓ Help & Info", callback_data="show_help_menu")],
+    [
+        InlineKeyboardButton("💬 Report Bugs", url="https://t.me/Onlymrabhi01"), 
+        InlineKeyboardButton("📢 Updates Channel", url="https://t.me/narzob") 
+    ],
+    [InlineKeyboardButton("➕ Add Bot to Group", url="https://t.me/narzowordseekbot?startgroup=true")]
+])
+
+HELP_MENU_KEYBOARD = InlineKeyboardMarkup([
+    [InlineKeyboardButton("📝 How to Play", callback_data="show_how_to_play")],
+    [InlineKeyboardButton("📘 Commands List", callback_data="show_commands")],
+    [InlineKeyboardButton("🏆 Leaderboard", callback_data="show_leaderboard_menu")],
+    [InlineKeyboardButton("🏠 Back to Start", callback_data="back_to_start")]
+])
+
+PLAY_AGAIN_KEYBOARD = InlineKeyboardMarkup([
+    [InlineKeyboardButton("🎯 Start New Game", callback_data="new_game_menu")] 
+])
+
+NEW_GAME_KEYBOARD = InlineKeyboardMarkup([
+    [
+        InlineKeyboardButton("⭐ Easy (4 letters)", callback_data="start_easy"),
+        InlineKeyboardButton("🌟 Medium (5 letters)", callback_data="start_medium")
+    ],
+    [
+        InlineKeyboardButton("🔥 Hard (8 letters)", callback_data="start_hard"),
+        InlineKeyboardButton("💎 Extreme (8 letters, High Pts)", callback_data="start_extreme")
+    ],
+    [InlineKeyboardButton("🏠 Back to Start", callback_data="back_to_start")]
+])
+
+LEADERBOARD_MENU_KEYBOARD = InlineKeyboardMarkup([
+    [
+        InlineKeyboardButton("☀️ Daily", callback_data="show_leaderboard_daily"),
+        InlineKeyboardButton("📅 Weekly", callback_data="show_leaderboard_weekly"),
+    ],
+    [
+        InlineKeyboardButton("🗓️ Monthly", callback_data="show_leaderboard_monthly"),
+        InlineKeyboardButton("🌎 Global", callback_data="show_leaderboard_global"),
+    ],
+    [InlineKeyboardButton("🔙 Back to Help", callback_data="show_help_menu")]
+])
+
+# --- Leaderboard Utility Function ---
 
 async def display_leaderboard(update: Update, context: ContextTypes.DEFAULT_TYPE, period: str):
     """Fetches and displays the leaderboard for the given period."""
     if not mongo_manager:
-        await (update.callback_query.edit_message_text if update.callback_query else update.message.reply_text)("❌ *Database Error*. Cannot fetch leaderboard.")
+        await (update.callback_query.edit_message_text if update.callback_query else update.message.reply_text)("❌ <i>Database Error</i>. Cannot fetch leaderboard.", parse_mode='HTML')
         return
 
-    data = mongo_manager.get_leaderboard_data(period=period, limit=10)
+    data = await mongo_manager.get_leaderboard_data(period=period, limit=10)
     
     title = period.capitalize() if period != 'global' else 'Global'
     
     if not data:
-        message = f"🏆 **{title} Leaderboard**\n\n*No scores recorded for this period yet.*"
+        message = f"🏆 <b>{title} Leaderboard</b>\n\n<i>No scores recorded for this period yet.</i>"
     else:
-        message = f"🏆 **{title} Leaderboard** (Top 10)\n"
+        message = f"🏆 <b>{title} Leaderboard</b> (Top 10)\n"
         message += "-------------------------------------\n"
         for i, (username, points, wins) in enumerate(data):
-            rank_style = "🥇" if i == 0 else "🥈" if i == 1 else "🥉" if i == 2 else f"**{i+1}.**"
-            name = f"@{username}" if username else f"User ID `{data[i][0]}`"
-            message += f"{rank_style} {name} - **`{points}`** pts ({wins} wins)\n"
+            rank_style = "🥇" if i == 0 else "🥈" if i == 1 else "🥉" if i == 2 else f"<b>{i+1}.</b>"
+            name = f"@{html.escape(username)}" if username else f"User ID <code>{data[i][0]}</code>"
+            message += f"{rank_style} {name} - <b><code>{points}</code></b> pts ({wins} wins)\n"
             
     # Send as a new message if it's a command, or edit if it's a callback
     if update.callback_query:
-        await update.callback_query.edit_message_text(message, reply_markup=get_leaderboard_menu_keyboard(), parse_mode='Markdown')
+        await update.callback_query.edit_message_text(message, reply_markup=LEADERBOARD_MENU_KEYBOARD, parse_mode='HTML')
     else:
-        await update.message.reply_text(message, reply_markup=get_leaderboard_menu_keyboard(), parse_mode='Markdown')
+        await update.message.reply_text(message, reply_markup=LEADERBOARD_MENU_KEYBOARD, parse_mode='HTML')
 
-# --- Command Handlers (All Unchanged) ---
+# --- Command Handlers ---
 
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     if mongo_manager and update.effective_message:
         mongo_manager.add_chat(update.effective_chat.id, update.effective_chat.type.name, update.effective_message.date.timestamp())
     
     # Stylish Start Message
-    await update.message.reply_text(
-        "👋 *Hello! I'm* **@narzowordseekbot** 🤖\n"
-        "-------------------------------------\n"
-        "The **Ultimate Word Challenge** on Telegram!\n\n"
-        "📜 **Goal:** *Guess the secret word using hints (🟩/🟨/🟥).*\n"
-        "🏆 **Compete:** *Win to earn points and climb the Global Leaderboard!* 🌐\n\n"
-        "👉 Tap **/new** or the button below to start your rush!\n"
-        "-------------------------------------",
-        reply_markup=get_start_keyboard(),
-        parse_mode='Markdown'
-    )
+    await update.message.reply_text(WELCOME_TEXT, reply_markup=START_KEYBOARD, parse_mode='HTML')
 
+@serialize_per_chat
 async def new_game_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     chat_id = update.effective_chat.id
     if mongo_manager and update.effective_message:
         mongo_manager.add_chat(chat_id, update.effective_chat.type.name, update.effective_message.date.timestamp())
 
     difficulty = context.args[0].lower() if context.args else 'medium'
-    
-    if mongo_manager and mongo_manager.get_game_state(chat_id):
-        await update.message.reply_text("⏳ *A game is already active*. Use **/end** to stop it first.")
-        return
 
     success, message = await start_new_game_logic(chat_id, difficulty)
-    await update.message.reply_text(message, parse_mode='Markdown')
+    board = await update.message.reply_text(message, parse_mode='HTML')
+    if success:
+        # The start message doubles as the game board that later guesses edit in place
+        await mongo_manager.set_board_message(chat_id, board.message_id)
 
+@serialize_per_chat
 async def end_game_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     chat_id = update.effective_chat.id
     
-    if not mongo_manager or not mongo_manager.get_game_state(chat_id):
-        await update.message.reply_text("❌ *No game is currently running to end*.")
+    game_state = await mongo_manager.get_game_state(chat_id) if mongo_manager else None
+    if not game_state:
+        await update.message.reply_text("❌ <i>No game is currently running to end</i>.", parse_mode='HTML')
         return
         
     if not await is_group_admin(update, context):
-        await update.message.reply_text("🚨 *Admin Check Failed*. You must be an **Admin** to force-end the game.", parse_mode='Markdown')
+        await update.message.reply_text("🚨 <i>Admin Check Failed</i>. You must be an <b>Admin</b> to force-end the game.", parse_mode='HTML')
         return
 
-    game_state = mongo_manager.get_game_state(chat_id)
     word = game_state.get('word', 'UNKNOWN')
-    mongo_manager.delete_game_state(chat_id)
+    await mongo_manager.delete_game_state(chat_id)
     
     await update.message.reply_text(
-        f"🛑 **Game Ended!**\n"
-        f"*The secret word was:* **`{word}`**.", 
-        parse_mode='Markdown'
+        f"🛑 <b>Game Ended!</b>\n"
+        f"<i>The secret word was:</i> <b><code>{word}</code></b>.", 
+        parse_mode='HTML'
     )
 
+@serialize_per_chat
 async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Shows the current game status and guess history."""
     chat_id = update.effective_chat.id
     if not mongo_manager:
-        await update.message.reply_text("❌ *Database Error*. Cannot fetch game status.")
+        await update.message.reply_text("❌ <i>Database Error</i>. Cannot fetch game status.", parse_mode='HTML')
         return
 
-    game_state = mongo_manager.get_game_state(chat_id)
+    game_state = await mongo_manager.get_game_state(chat_id)
     if not game_state:
-        await update.message.reply_text("🎯 *No active game*. Use **/new** to start a challenge!")
+        await update.message.reply_text("🎯 <i>No active game</i>. Use <b>/new</b> to start a challenge!", parse_mode='HTML')
         return
     
     guess_history = game_state.get('guess_history', [])
     
     if not guess_history:
-        history_display = "*No guesses made yet!*"
+        history_display = "<i>No guesses made yet!</i>"
     else:
-        history_display = "\n".join(guess_history)
+        history_display = format_guess_history(guess_history)
 
     remaining = game_state['max_guesses'] - game_state['guesses_made']
     
     reply_text = (
-        f"**📊 Current Word Rush Status**\n"
+        f"<b>📊 Current Word Rush Status</b>\n"
         f"-------------------------------------\n"
-        f"Difficulty: **{game_state['difficulty'].capitalize()}**\n"
-        f"Word Length: **{len(game_state['word'])} letters**\n"
-        f"Guesses: **`{game_state['guesses_made']}`** / **`{game_state['max_guesses']}`**\n"
-        f"Remaining: **`{remaining}`**\n\n"
-        f"📜 **Guess History:**\n"
+        f"Difficulty: <b>{game_state['difficulty'].capitalize()}</b>\n"
+        f"Word Length: <b>{len(game_state['word'])} letters</b>\n"
+        f"Guesses: <b><code>{game_state['guesses_made']}</code></b> / <b><code>{game_state['max_guesses']}</code></b>\n"
+        f"Remaining: <b><code>{remaining}</code></b>\n\n"
+        f"📜 <b>Guess History:</b>\n"
         f"{history_display}"
     )
     
-    await update.message.reply_text(reply_text, parse_mode='Markdown')
+    await update.message.reply_text(reply_text, parse_mode='HTML')
 
 async def leaderboard_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Shows the leaderboard menu or the global leaderboard directly."""
@@ -509,39 +947,27 @@ async def leaderboard_command(update: Update, context: ContextTypes.DEFAULT_TYPE
         mongo_manager.add_chat(update.effective_chat.id, update.effective_chat.type.name, update.effective_message.date.timestamp())
 
     # If arguments are provided (e.g., /leaderboard daily), show that specific one
-    if context.args and context.args[0].lower() in ['daily', 'weekly', 'monthly', 'global']:
+    if context.args and context.args[0].lower() in LEADERBOARD_PERIODS:
         period = context.args[0].lower()
         await display_leaderboard(update, context, period)
         return
 
     # Otherwise, show the leaderboard menu
-    message = "🏆 **Global Leaderboard**\n\n*Choose a period below to view the rankings!*"
-    await update.message.reply_text(message, reply_markup=get_leaderboard_menu_keyboard(), parse_mode='Markdown')
+    message = "🏆 <b>Global Leaderboard</b>\n\n<i>Choose a period below to view the rankings!</i>"
+    await update.message.reply_text(message, reply_markup=LEADERBOARD_MENU_KEYBOARD, parse_mode='HTML')
 
 async def difficulty_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Shows available difficulty levels and their settings."""
     chat_id = update.effective_chat.id
 
     if not await is_group_admin(update, context):
-        await update.message.reply_text("🚨 *Admin Check Failed*. You must be an **Admin** to view or change settings.", parse_mode='Markdown')
+        await update.message.reply_text("🚨 <i>Admin Check Failed</i>. You must be an <b>Admin</b> to view or change settings.", parse_mode='HTML')
         return
 
-    message = "**⚙️ Word Rush Difficulty Settings**\n"
-    message += "-------------------------------------\n"
-    
-    for level, config in DIFFICULTY_CONFIG.items():
-        message += f"**{level.capitalize()}**:\n"
-        message += f"   - Word Length: **{config['length']}** letters\n"
-        message += f"   - Max Guesses: **{config['max_guesses']}**\n"
-        message += f"   - Base Points: **{config['base_points']}**\n"
-        message += f"   - Example: `{config['example']}`\n\n"
-
-    message += "👉 *Use* `/new <level>` *to start a game with a specific difficulty.* (e.g., `/new hard`)"
-
-    await update.message.reply_text(message, parse_mode='Markdown')
+    await update.message.reply_text(DIFFICULTY_SETTINGS_TEXT, parse_mode='HTML')
 
 
-# --- Broadcast Command (Unchanged, Admin only) ---
+# --- Broadcast Command (Admin only) ---
 
 async def broadcast_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Sends a message to all known chats (Admin only)."""
@@ -550,7 +976,7 @@ async def broadcast_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
         return
 
     if not context.args:
-        await update.message.reply_text("Usage: `/broadcast <your message here>`", parse_mode='Markdown')
+        await update.message.reply_text("Usage: <code>/broadcast &lt;your message here&gt;</code>", parse_mode='HTML')
         return
     
     if not mongo_manager:
@@ -558,87 +984,93 @@ async def broadcast_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
         return
 
     message_to_send = " ".join(context.args)
-    chat_ids = mongo_manager.get_all_chat_ids()
     
-    success_count = 0
-    fail_count = 0
-    
-    await update.message.reply_text(f"📢 *Attempting to broadcast message to* **{len(chat_ids)}** *chats...*")
-
-    for chat_id in chat_ids:
+    await update.message.reply_text(f"📢 <i>Attempting to broadcast message to</i> <b>{await mongo_manager.count_chats()}</b> <i>chats...</i>", parse_mode='HTML')
+
+    # Recipients are streamed from the cursor into a bounded queue drained by a fixed worker pool
+    queue: asyncio.Queue = asyncio.Queue(maxsize=BROADCAST_CONCURRENCY * 2)
+    counts = {'success': 0, 'fail': 0}
+    # Cleared while Telegram's flood-control cooldown runs so that every worker pauses, not just the one that hit it
+    not_throttled = asyncio.Event()
+    not_throttled.set()
+
+    async def _cool_down(e: error.RetryAfter):
+        if not not_throttled.is_set():
+            return await not_throttled.wait() # Another worker is already waiting it out
+        not_throttled.clear()
         try:
-            await context.bot.send_message(chat_id=chat_id, text=message_to_send, parse_mode='Markdown')
-            success_count += 1
+            await asyncio.sleep(e.retry_after.total_seconds() if isinstance(e.retry_after, timedelta) else e.retry_after)
+        finally:
+            not_throttled.set()
+
+    async def _send(chat_id: int) -> bool:
+        await not_throttled.wait()
+        # Holding the worker for at least one second turns the pool into a simple rate limiter
+        pacing = asyncio.create_task(asyncio.sleep(1))
+        try:
+            try:
+                await context.bot.send_message(chat_id=chat_id, text=message_to_send, parse_mode='Markdown')
+            except error.RetryAfter as e:
+                # Flood control: pause the whole broadcast for Telegram's cooldown, then retry once
+                await _cool_down(e)
+                await context.bot.send_message(chat_id=chat_id, text=message_to_send, parse_mode='Markdown')
+            return True
         except error.Forbidden:
             logger.warning(f"Failed to send broadcast to chat {chat_id}: Bot blocked.")
-            fail_count += 1
+            return False
         except Exception as e:
             logger.error(f"Failed to send broadcast to chat {chat_id}: {e}")
-            fail_count += 1
+            return False
+        finally:
+            await pacing
+
+    async def _worker():
+        while True:
+            chat_id = await queue.get()
+            if chat_id is None:
+                return
+            counts['success' if await _send(chat_id) else 'fail'] += 1
+
+    workers = [asyncio.create_task(_worker()) for _ in range(BROADCAST_CONCURRENCY)]
+    try:
+        async for doc in mongo_manager.iter_chat_ids(batch_size=BROADCAST_CONCURRENCY):
+            await queue.put(doc['chat_id'])
+    finally:
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+
+    success_count = counts['success']
+    fail_count = counts['fail']
             
-    await update.message.reply_text(f"✅ **Broadcast Complete**\nSuccessful: **{success_count}**\nFailed: **{fail_count}**", parse_mode='Markdown')
+    await update.message.reply_text(f"✅ <b>Broadcast Complete</b>\nSuccessful: <b>{success_count}</b>\nFailed: <b>{fail_count}</b>", parse_mode='HTML')
 
-# --- Callback Handler (Unchanged) ---
+# --- Callback Handler ---
+@serialize_per_chat
 async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     query = update.callback_query
     await query.answer() 
     chat_id = query.message.chat_id
     
     if query.data == "back_to_start":
-        await query.edit_message_text(
-            "👋 *Hello! I'm* **WordRush Bot** 🤖\n"
-            "-------------------------------------\n"
-            "The **Ultimate Word Challenge** on Telegram!\n\n"
-            "📜 **Goal:** *Guess the secret word using hints (🟩/🟨/🟥).*\n"
-            "🏆 **Compete:** *Win to earn points and climb the Global Leaderboard!* 🌐\n\n"
-            "👉 Tap **/new** or the button below to start your rush!\n"
-            "-------------------------------------",
-            reply_markup=get_start_keyboard(),
-            parse_mode='Markdown'
-        )
+        await query.edit_message_text(WELCOME_TEXT, reply_markup=START_KEYBOARD, parse_mode='HTML')
     
     elif query.data == "show_help_menu":
-        await query.edit_message_text(
-            "📖 **WordRush Help Center**\n"
-            "-------------------------------------\n"
-            "*Choose a topic below to get assistance.*\n"
-            "*For any issue, please ask in the Report group!*",
-            reply_markup=get_help_menu_keyboard(),
-            parse_mode='Markdown'
-        )
+        await query.edit_message_text(HELP_MENU_TEXT, reply_markup=HELP_MENU_KEYBOARD, parse_mode='HTML')
 
     elif query.data == "show_how_to_play":
-        commands_list = (
-            "🤔 **How to Play Word Rush** ❓\n"
-            "-------------------------------------\n"
-            "1. **The Word:** *Guess a secret word*, length depends on difficulty (4, 5, or 8 letters).\n\n"
-            "2. **The Hints (`Boxes - Word`):**\n"
-            "   • 🟢 *Green* = Correct letter, **Right Place**.\n"
-            "   • 🟡 *Yellow* = Correct letter, **Wrong Place**.\n"
-            "   • 🔴 *Red* = Letter **Not in the Word**.\n\n"
-            "3. **The Game:** You have *30 guesses*. The person who wins with the fewest guesses gets the most points! 🥇"
-        )
-        await query.edit_message_text(commands_list, reply_markup=get_help_menu_keyboard(), parse_mode='Markdown')
+        await query.edit_message_text(HOW_TO_PLAY_TEXT, reply_markup=HELP_MENU_KEYBOARD, parse_mode='HTML')
 
     elif query.data == "show_commands":
-        commands_list = (
-            "📘 **Word Rush Commands List**\n"
-            "-------------------------------------\n"
-            "• **/new** [difficulty] → *Start a game*.\n"
-            "• **/status** → *Show current game status and history* (New Feature!).\n"
-            "• **/leaderboard** [period] → *Show global/daily/weekly/monthly rankings*.\n"
-            "• **/end** → *End current game* (Admin Only / DM).\n"
-            "• **/difficulty** → *Show difficulty settings* (Admin Only / DM).\n"
-        )
-        await query.edit_message_text(commands_list, reply_markup=get_help_menu_keyboard(), parse_mode='Markdown')
+        await query.edit_message_text(COMMANDS_TEXT, reply_markup=HELP_MENU_KEYBOARD, parse_mode='HTML')
         
     elif query.data == "show_leaderboard_menu":
         await query.edit_message_text(
-            "🏆 **Leaderboard Selection**\n"
+            "🏆 <b>Leaderboard Selection</b>\n"
             "-------------------------------------\n"
-            "*Select the ranking period you wish to view.*",
-            reply_markup=get_leaderboard_menu_keyboard(),
-            parse_mode='Markdown'
+            "<i>Select the ranking period you wish to view.</i>",
+            reply_markup=LEADERBOARD_MENU_KEYBOARD,
+            parse_mode='HTML'
         )
         
     elif query.data.startswith("show_leaderboard_"):
@@ -647,27 +1079,44 @@ async def callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -
 
     elif query.data == "new_game_menu":
         await query.edit_message_text(
-            "🎯 **Select Your Challenge Level:**\n"
-            "*Choose the word length and point value.*",
-            reply_markup=get_new_game_keyboard(),
-            parse_mode='Markdown'
+            "🎯 <b>Select Your Challenge Level:</b>\n"
+            "<i>Choose the word length and point value.</i>",
+            reply_markup=NEW_GAME_KEYBOARD,
+            parse_mode='HTML'
         )
     
     elif query.data.startswith("start_"):
         difficulty = query.data.split('_')[1]
-        
-        if mongo_manager and mongo_manager.get_game_state(chat_id):
-            await query.edit_message_text("⏳ *A game is already active*. Use **/end** to stop it first.")
-            return
 
         success, message = await start_new_game_logic(chat_id, difficulty)
         if success:
-            await query.edit_message_text(message, parse_mode='Markdown')
+            await query.edit_message_text(message, parse_mode='HTML')
+            await mongo_manager.set_board_message(chat_id, query.message.message_id)
+        elif message == GAME_ACTIVE_TEXT:
+            await query.edit_message_text(message, parse_mode='HTML')
         else:
-            await query.edit_message_text(f"❌ *Game start failed*: {message}", parse_mode='Markdown')
+            await query.edit_message_text(f"❌ <i>Game start failed</i>: {message}", parse_mode='HTML')
 
 # --- Updated Guess Handler (Handles the new error message) ---
 
+async def refresh_game_board(context: ContextTypes.DEFAULT_TYPE, chat_id: int, message_id: int | None, text: str) -> bool:
+    """Edits the game board in place. Returns False when a fresh board has to be sent instead."""
+    if not message_id:
+        return False
+    try:
+        await context.bot.edit_message_text(chat_id=chat_id, message_id=message_id, text=text, parse_mode='HTML')
+    except error.BadRequest as e:
+        # Telegram rejects edits that change nothing; the board is already current
+        if 'not modified' in str(e).lower():
+            return True
+        logger.warning(f"Could not edit game board {message_id} in chat {chat_id}: {e}")
+        return False
+    except error.TelegramError as e:
+        logger.warning(f"Could not edit game board {message_id} in chat {chat_id}: {e}")
+        return False
+    return True
+
+@serialize_per_chat
 async def handle_guess(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     chat_id = update.effective_chat.id
     user = update.effective_user
@@ -679,83 +1128,100 @@ async def handle_guess(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
     if not mongo_manager:
         return
 
-    game_state = mongo_manager.get_game_state(chat_id)
+    game_state = await mongo_manager.get_game_state(chat_id)
     if not game_state:
         return 
 
-    # Process guess
-    feedback, is_win, status_message, points, guess_history = await process_guess_logic(chat_id, guess)
+    # Process guess (reuses the state fetched above instead of reading it again)
+    is_win, status_message, points, guess_history, word_was = await process_guess_logic(chat_id, game_state, guess)
     
     # 1. Handle validation errors (Incorrect length OR Duplicate guess)
     if status_message.startswith("❌"):
-        await update.message.reply_text(status_message, parse_mode='Markdown')
+        await update.message.reply_text(status_message, parse_mode='HTML')
         return
 
     reply_markup = None
     
-    # 2. Construct the full history display
-    game_history_display = "\n".join(guess_history)
+    # 2. Fields shared by every board template
+    fields = {
+        'history': format_guess_history(guess_history),
+        'attempts': game_state['guesses_made'], # Already counts this guess; the stored history is capped
+        'max_guesses': game_state['max_guesses'],
+    }
     
     # 3. Handle Win/Loss/Ongoing
     
     if is_win:
-        word_was = guess_history[-1].split(' - ')[-1].replace('**', '').strip() 
-        
-        # This function now updates global, daily, weekly, and monthly scores
-        mongo_manager.update_leaderboard(user.id, username, points) 
-        
-        reply_text = (
-            f"**🏆 GAME WON! 🥳**\n"
-            f"-------------------------------------\n"
-            f"*Congratulations* **{username}**!\n"
-            f"You cracked the code in **{len(guess_history)}** attempts!\n"
-            f"✨ Points earned: **`{points}`**\n\n"
-            f"📜 **Final Board:**\n"
-            f"{game_history_display}\n\n" 
-            f"✅ *The secret word was:* **`{word_was}`**"
+        # Independent writes to different collections: run both round-trips at once.
+        # update_leaderboard covers global, daily, weekly, and monthly scores.
+        await asyncio.gather(
+            mongo_manager.update_leaderboard(user.id, username, points),
+            mongo_manager.delete_game_state(chat_id),
         )
-        reply_markup = get_play_again_keyboard()
-
-    elif status_message.startswith("LOSS_WORD:"):
-        word_was = status_message.split(":")[1]
         
-        reply_text = (
-            f"💔 **GAME OVER! 😭**\n"
-            f"-------------------------------------\n"
-            f"*Maximum guesses reached* (**{game_state['max_guesses']}**).\n\n"
-            f"📜 **Final Board:**\n"
-            f"{game_history_display}\n\n" 
-            f"❌ *The secret word was:* **`{word_was}`**"
-        )
-        reply_markup = get_play_again_keyboard()
+        reply_text = WIN_TEXT.format_map({**fields, 'username': html.escape(username), 'points': points, 'word': word_was})
+        reply_markup = PLAY_AGAIN_KEYBOARD
+
+    elif status_message == "LOSS":
+        reply_text = LOSS_TEXT.format_map({**fields, 'word': word_was})
+        reply_markup = PLAY_AGAIN_KEYBOARD
 
     else:
-        # Ongoing game message (Show full history + status)
-        
-        reply_text = (
-            f"**Word Rush Challenge** 🎯\n"
-            f"-------------------------------------\n"
-            f"Attempts: **`{len(guess_history)}`** / **`{game_state['max_guesses']}`**\n\n"
-            f"📜 **Guess History:**\n"
-            f"{game_history_display}\n\n" 
-            f"👉 {status_message}" # Displays: Guesses left: **27**
-        )
+        # Ongoing game: update the board (full history + status) and reply with just this guess
+        reply_text = ONGOING_TEXT.format_map({**fields, 'status': status_message})
+        if await refresh_game_board(context, chat_id, game_state.get('board_message_id'), reply_text):
+            reply_text = GUESS_ACK_TEXT.format_map({'line': format_guess_history(guess_history[-1:]), 'status': status_message})
+        else:
+            # No usable board (missing, deleted or too old): this reply becomes the new one
+            board = await update.message.reply_text(reply_text, parse_mode='HTML')
+            await mongo_manager.set_board_message(chat_id, board.message_id)
+            return
     
     await update.message.reply_text(
         reply_text, 
         reply_markup=reply_markup, 
-        parse_mode='Markdown'
+        parse_mode='HTML'
     )
 
 # --- Main Bot Runner ---
 
+async def post_init(application: Application) -> None:
+    global mongo_manager
+    if not mongo_manager:
+        return
+    try:
+        await mongo_manager.init()
+    except Exception as e:
+        logger.error(f"❌ FATAL: Could not connect to MongoDB. Error: {e}")
+        mongo_manager = None
+        return
+    mongo_manager.start_chat_writer()
+
+async def post_shutdown(application: Application) -> None:
+    if mongo_manager:
+        await mongo_manager.stop_chat_writer()
+        await mongo_manager.client.close()
+
 def main():
     """Start the bot."""
     if not BOT_TOKEN:
         logger.error("FATAL ERROR: BOT_TOKEN not found. Please set it in the .env file.")
         return
     
-    application = Application.builder().token(BOT_TOKEN).build()
+    application = (
+        Application.builder()
+        .token(BOT_TOKEN)
+        .concurrent_updates(True) # Cross-chat parallelism; serialize_per_chat keeps each chat ordered
+        # Bot API calls (replies, edits, broadcasts) multiplex over HTTP/2 from one shared pool;
+        # getUpdates long-polling keeps its own connection so it never competes with sends
+        .http_version('2')
+        .connection_pool_size(BOT_API_POOL_SIZE)
+        .pool_timeout(5.0)
+        .connect_timeout(5.0)
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
 
     # Register Handlers
     application.add_handler(CommandHandler("start", start_command))
@@ -770,20 +1236,37 @@ def main():
     
     application.add_handler(CommandHandler("help", start_command)) 
 
+    # Keeps the admin check cache honest when someone is promoted or demoted
+    application.add_handler(ChatMemberHandler(chat_member_update_handler, ChatMemberHandler.CHAT_MEMBER))
+
     # Callback query handler for inline buttons
     application.add_handler(CallbackQueryHandler(callback_handler))
     
     # Message handler for guesses:
     application.add_handler(
         MessageHandler(
-            filters.TEXT & ~filters.COMMAND & filters.Regex(r'^[a-zA-Z]{1,8}$'), 
+            filters.TEXT & ~filters.COMMAND & filters.Regex(GUESS_RE), 
             handle_guess
         )
     )
 
     logger.info("🚀 WordRush Bot is running (Guess Uniqueness & Leaderboards Ready)...")
-    
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+
+    # Only the update types the handlers above consume; chat_member must be requested explicitly
+    allowed_updates = [Update.MESSAGE, Update.CALLBACK_QUERY, Update.CHAT_MEMBER]
+    if WEBHOOK_URL:
+        # A fresh random path per start keeps the endpoint unguessable on top of the secret token
+        webhook_path = secrets.token_urlsafe(16)
+        application.run_webhook(
+            listen='0.0.0.0',
+            port=PORT,
+            url_path=webhook_path,
+            webhook_url=f"{WEBHOOK_URL}/{webhook_path}",
+            secret_token=WEBHOOK_SECRET,
+            allowed_updates=allowed_updates,
+        )
+    else:
+        application.run_polling(allowed_updates=allowed_updates)
 
 if __name__ == "__main__":
     main()